@@ -47,14 +47,13 @@ import re
 import sys
 import csv
 import datetime
-
-import docx
+import zipfile
+import xml.etree.ElementTree as ElementTree
+from concurrent.futures import ProcessPoolExecutor
 
 def _get_current_time() -> str:
     """ Get the current date and time as a string """
-    now = datetime.datetime.now()
-    return f'{now.year}-{now.month}-{now.day} {"{:02d}".format(now.hour)}:' \
-           f'{"{:02d}".format(now.minute)}:{"{:02d}".format(now.second)}'
+    return datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
 
 def _get_current_time_for_filename() -> str:
@@ -80,22 +79,33 @@ class Docx2CSV:
         'Work Date': re.compile(r'Año:\W*(?P<match>.+)|Fecha:\W*(?P<match_2>.+)'),
     }
 
-    RE_FOUR_DIGIT_YEAR = re.compile(r'^\d\d\d\d$')
-    RE_FOUR_DIGIT_YEAR_NAMED_MONTH = re.compile(r'^(?P<year>\d\d\d\d),* (?P<potential_month>\w+)$')
-    RE_NAMED_MONTH_FOUR_DIGIT_YEAR = re.compile(r'^(?P<potential_month>\w+),* (de )*(?P<year>\d\d\d\d)$')
-    RE_FOUR_DIGIT_YEAR_NAMED_MONTH_DAY = re.compile(r'^(?P<year>\d\d\d\d),* (?P<potential_month>\w+) (?P<day>\d\d)$')
-    RE_DAY_NAMED_MONTH_YEAR = re.compile(r'^(?P<day>\d\d?) de (?P<potential_month>\w+) de (?P<year>\d\d\d\d)$')
-    RE_MONTH_SLASH_YEAR = re.compile(r'^(?P<month>\d\d?)/(?P<year>\d+)$')
-    RE_YEAR_SLASH_MONTH = re.compile(r'^(?P<month>\d\d?)/(?P<year>\d+)$')
-
-    RE_DD_MM_YYYY = re.compile(r'^(?P<day>\d\d?)-(?P<month>\d\d?)-(?P<year>\d\d\d?\d?)$')
+    # Every supported date shape fused into one alternation; branches keep the order the old separate
+    # patterns were tried in, and each gets its own group prefix so a single match() tells both which
+    # shape matched and what it captured.
+    RE_DATE = re.compile(
+        r'^(?:(?P<bare_year>\d\d\d\d)'
+        r'|(?P<ynm_year>\d\d\d\d),* (?P<ynm_month>\w+)'
+        r'|(?P<ynmd_year>\d\d\d\d),* (?P<ynmd_month>\w+) (?P<ynmd_day>\d\d)'
+        r'|(?P<nmy_month>\w+),* (de )*(?P<nmy_year>\d\d\d\d)'
+        r'|(?P<dnmy_day>\d\d?) de (?P<dnmy_month>\w+) de (?P<dnmy_year>\d\d\d\d)'
+        r'|(?P<my_month>\d\d?)/(?P<my_year>\d+)'
+        r'|(?P<dmy_day>\d\d?)-(?P<dmy_month>\d\d?)-(?P<dmy_year>\d\d\d?\d?))$')
+
+    # Date values that should pass through _reformat_dates untouched
+    DATE_SKIP_EXACT = frozenset({'No presenta', 'No', 'S/F', 'Varias'})
+    RE_DATE_SKIP = re.compile(r"Sin fecha|Circa|Posterior|'s")
 
     SPANISH_MONTH_TO_DIGIT_INDEX = ['ENERO', 'FEBRERO', 'MARZO', 'ABRIL', 'MAYO', 'JUNIO', 'JULIO', 'AGOSTO',
                                     'SEPTIEMBRE', 'OCTUBRE', 'NOVIEMBRE', 'DICIEMBRE']
+    SPANISH_MONTH_TO_DIGIT = {name: index + 1 for index, name in enumerate(SPANISH_MONTH_TO_DIGIT_INDEX)}
+
+    WORDPROCESSINGML_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+    CSV_HEADERS = ['Work ID', 'File', 'Work Agent', 'Work Title', 'Work Type', 'Work Description',
+                   'Work Measurements', 'Work Date']
 
     def __init__(self, root_path: str):
         self.root_path = root_path
-        self.rows: list[dict] = []
         self.alerts: list[str] = []
 
     @staticmethod
@@ -118,119 +128,142 @@ class Docx2CSV:
         1 - Go over each directory on the root path
         2 - For each directory extract data from .docx files
         3 - For each of those .docx files pair up with images
-        4 - Write data into CSV
+        4 - Stream each row into the CSV as soon as its directory is done
         """
-        directories = [d for d in os.listdir(self.root_path) if os.path.isdir(f'{self.root_path}/{d}')]
+        with os.scandir(self.root_path) as it:
+            directories = [e for e in it if not e.name.startswith('.') and e.is_dir(follow_symlinks=False)]
         self._info_msg(f'Starting scrap on: "{self.root_path}" at {_get_current_time()}, found {len(directories)} '
                        f'directories...')
-        for directory in directories:
-            if not directory.startswith('.'):  # (.DS_Store)
-                self.rows.extend(self._handle_directory(f'{self.root_path}/{directory}'))
+        output_filename = f'output_{_get_current_time_for_filename()}.csv'
+        with open(output_filename, 'w', encoding='utf-8', newline='', buffering=1 << 20) as w_file:
+            csv_writer = csv.writer(w_file, delimiter=',', quotechar='"', quoting=csv.QUOTE_ALL)
+            csv_writer.writerow(self.CSV_HEADERS)
+            with ProcessPoolExecutor() as executor:
+                for rows, alerts in executor.map(self._handle_directory, [d.path for d in directories],
+                                                 chunksize=4):
+                    csv_writer.writerows(rows)
+                    for msg in alerts:
+                        self._error_msg(msg, fatal=False)
         self._info_msg(f'Found {len(self.alerts)} alerts. Logging, please wait...')
-        self._info_msg(f'Writing CSV, please wait...')
         self.write_alerts()
-        self.write_csv()
         self._info_msg(f'Finished scrap at {_get_current_time()}')
 
-    def _handle_directory(self, path: str) -> list[dict]:
+    @classmethod
+    def _handle_directory(cls, path: str) -> tuple[list[list], list[str]]:
         """
         Handle the directory by separating its contents in .docx and other type of files, going over each .docx,
         attempting to parse the data therein, using ._parse_data(), and then using _find_image_files() to find its
         related images.
 
+        Runs in worker processes, so instead of touching shared state it returns the alert messages it raised
+        alongside the rows.
+
         :param path: valid directory for Artist information
-        :return: list of dicts relating the .docx data with each image file its associated with
+        :return: tuple of (list of ready-to-write CSV rows relating the .docx data with each image file its
+                 associated with, list of alert messages)
         """
-        files = [f for f in os.listdir(path) if not f.startswith('.') and os.path.isfile(os.path.join(path, f))]
-        docx_files = [f for f in files if f.lower().endswith('.docx')]
-        other_files = list(filter(lambda x: x not in docx_files, files))
+        with os.scandir(path) as it:
+            entries = [e for e in it if not e.name.startswith('.') and e.is_file(follow_symlinks=False)]
+        docx_files = [e for e in entries if e.name.lower().endswith('.docx')]
+        other_files = {e.name for e in entries if not e.name.lower().endswith('.docx')}
+
+        # Group image files by the first dash-separated chunk of their normalized basename, so each .docx
+        # only has to check the handful of candidates sharing its prefix instead of every file in the
+        # directory.
+        image_index: dict[str, list[tuple[str, str]]] = {}
+        for entry in entries:
+            low = entry.name.lower()
+            if low.endswith(('.jpg', '.jpeg')):
+                normalized = low.split('.')[0]  # Remove extension and go no-case
+                image_index.setdefault(normalized.split('-')[0], []).append((entry.name, normalized))
 
         csv_rows = []
+        alerts = []
+        matched: set[str] = set()
         for f in docx_files:
-            data = self._parse_data(os.path.join(path, f))
-            image_files = self._find_image_files(other_files, f)
+            data = cls._parse_data(f.path, alerts)
+            image_files = cls._find_image_files(image_index, f.name)
             if not image_files:
-                self._error_msg(f"No images for: {os.path.join(path, f)}", fatal=False)
+                alerts.append(f"No images for: {f.path}")
             else:
+                base_row = cls._format_row(data)
                 for imf in image_files:
-                    csv_rows.append(data | {'Image File': imf})
-                    other_files.remove(imf)
+                    row = base_row.copy()
+                    row[1] = cls._remove_end_dots(imf)
+                    csv_rows.append(row)
+                matched.update(image_files)
 
-        if other_files:
-            self._error_msg(f"Extra images in : {path} -> {', '.join(other_files)}", fatal=False)
+        leftover_files = other_files - matched
+        if leftover_files:
+            alerts.append(f"Extra images in : {path} -> {', '.join(sorted(leftover_files))}")
 
-        return csv_rows
+        return csv_rows, alerts
 
-    def _parse_data(self, file_path: str) -> dict:
+    @classmethod
+    def _parse_data(cls, file_path: str, alerts: list[str]) -> dict:
         """
-        Open the document at file_path using docx.Document, transform it into text, and generate a dict of data
-        points by attempting to match the data according to Docx2Csv.KEY_TO_RE.
+        Open the document at file_path as a zip archive, pull the paragraph text straight out of
+        word/document.xml, and generate a dict of data points by attempting to match the data according to
+        Docx2Csv.KEY_TO_RE.
 
         :param file_path : valid .docx filepath
+        :param alerts : list collecting alert messages for keys that could not be matched
         :return : dict with keys as in Docx2CSV.KEY_TO_RE, with matched data.
         """
+        w_p, w_t = cls.WORDPROCESSINGML_NS + 'p', cls.WORDPROCESSINGML_NS + 't'
+        paragraphs = []
+        with zipfile.ZipFile(file_path) as z, z.open('word/document.xml') as f:
+            for _, element in ElementTree.iterparse(f):
+                if element.tag == w_p:
+                    paragraphs.append(''.join(t.text or '' for t in element.iter(w_t)))
+                    element.clear()
+        txt = '\n'.join(paragraphs)
         data = {}
-
-        d: docx.Document = docx.Document(file_path)
-        txt = '\n'.join([p.text for p in d.paragraphs])
-        for key in self.KEY_TO_RE:
-            match = re.search(self.KEY_TO_RE[key], txt)
+        for key, pattern in cls.KEY_TO_RE.items():
+            match = pattern.search(txt)
             if match:
-                if match.group('match'):
-                    data[key] = match.group('match')
-                else:
-                    data[key] = match.group('match_2')
+                data[key] = match.group('match') or match.group('match_2')
             else:
                 data[key] = None
-                self._error_msg(f'{key} not found in file: {file_path}', fatal=False)
+                alerts.append(f'{key} not found in file: {file_path}')
 
         return data
 
-    @staticmethod
-    def _find_image_files(other_files: list[str], docx_file_name: str) -> list[str]:
+    @classmethod
+    def _find_image_files(cls, image_index: dict[str, list[tuple[str, str]]], docx_file_name: str) -> list[str]:
         """
-        Find image files (.jpg/.jpeg) in other_files, that share full, (or partial in the case of serialized image
-        files) filename with docx_file_name
+        Find image files (.jpg/.jpeg) in image_index, that share full, (or partial in the case of serialized
+        image files) filename with docx_file_name
 
-        :param other_files: list of file names in the same directory as docx_file_name
+        :param image_index: (file name, normalized basename) pairs for the images in the same directory as
+                            docx_file_name, grouped by the first dash-separated chunk of the normalized
+                            basename
         :param docx_file_name: name of .docx file to check against
         :return: list of matching file names
         """
         normalized_docx_file_name = docx_file_name.split('.')[0].lower()
+        # Accepts the exact docx basename plus optional NAME-\d+ sequences for serialized image files
+        pattern = re.compile(re.escape(normalized_docx_file_name) + r'(?:-\d+)?')
         image_files = []
-        for file in other_files:
-            if file.lower().endswith('.jpg') or file.lower().endswith('.jpeg'):
-                normalized_potential_image_filename = file.split('.')[0].lower()  # Remove extension and go no-case
-                if normalized_potential_image_filename == normalized_docx_file_name:
-                    image_files.append(file)
-                else:  # Use re to check for NAME-\d+ sequences
-                    match = re.search(f'{normalized_docx_file_name}-\d+', normalized_potential_image_filename)
-                    if match:
-                        image_files.append(file)
+        for file, normalized_potential_image_filename in image_index.get(normalized_docx_file_name.split('-')[0], []):
+            if pattern.fullmatch(normalized_potential_image_filename):
+                image_files.append(file)
         return image_files
 
-    def write_csv(self):
-        """ Write rows into CSV """
-        headers = ['Work ID', 'File', 'Work Agent', 'Work Title', 'Work Type', 'Work Description', 'Work Measurements',
-                   'Work Date']
-
-        output_filename = f'output_{_get_current_time_for_filename()}.csv'
-        with open(output_filename, 'w', encoding='utf-8', newline='') as w_file:
-            csv_writer = csv.writer(w_file, delimiter=',', quotechar='"', quoting=csv.QUOTE_ALL)
-            csv_writer.writerow(headers)
-
-            for r in self.rows:
-                row = [
-                    self._remove_end_dots(r['Work ID']),
-                    self._remove_end_dots(r['Image File']),
-                    self._remove_end_dots(r['Work Agent']),
-                    self._remove_end_dots(r['Work Title']),
-                    self._remove_end_dots(r['Work Type']),
-                    self._remove_end_dots(r['Work Description']),
-                    self._remove_end_dots(r['Work Measurements']),
-                    self._reformat_dates(self._remove_end_dots(r['Work Date'])),
-                ]
-                csv_writer.writerow(row)
+    @classmethod
+    def _format_row(cls, r: dict) -> list:
+        """ Clean a parsed data dict and order it as a CSV row following CSV_HEADERS. The 'File' column is
+        left as None for the caller to fill in per associated image. """
+        return [
+            cls._remove_end_dots(r['Work ID']),
+            None,
+            cls._remove_end_dots(r['Work Agent']),
+            cls._remove_end_dots(r['Work Title']),
+            cls._remove_end_dots(r['Work Type']),
+            cls._remove_end_dots(r['Work Description']),
+            cls._remove_end_dots(r['Work Measurements']),
+            cls._reformat_dates(cls._remove_end_dots(r['Work Date'])),
+        ]
 
     def write_alerts(self):
         """ Dump alerts into logfile """
@@ -238,15 +271,15 @@ class Docx2CSV:
         with open(output_filename, 'w', encoding='utf-8') as w_file:
             w_file.write('\n'.join(self.alerts))
 
-    def _reformat_dates(self, date_txt: str) -> str:
+    @classmethod
+    def _reformat_dates(cls, date_txt: str) -> str:
         """ Attempt to reformat dates into YYYY-MM-DD by handling some special cases """
         def format_stuff(raw_str: str, year: str, month: str, day: str = None, named_month: bool = False) -> str:
-            """ Format matched output as YYYY-MM-DD. If named_month is True try to map month into
-            SPANISH_MONTH_TO_DIGIT_INDEX , if that fails return raw_str instead of formatting. """
+            """ Format matched output as YYYY-MM-DD. If named_month is True try to map month through
+            SPANISH_MONTH_TO_DIGIT , if that fails return raw_str instead of formatting. """
             if named_month:
-                if month.upper() in self.SPANISH_MONTH_TO_DIGIT_INDEX:
-                    month = Docx2CSV.SPANISH_MONTH_TO_DIGIT_INDEX.index(month.upper()) + 1
-                else:
+                month = cls.SPANISH_MONTH_TO_DIGIT.get(month.upper())
+                if month is None:
                     return raw_str
 
             return f'{year if len(year) > 2 else "19" + year}-{"{:02d}".format(int(month))}' \
@@ -259,39 +292,36 @@ class Docx2CSV:
         date_txt = date_txt.strip()  # Get rid of trailing spaces
 
         # Get rid of these beforehand
-        if 'Sin fecha' in date_txt or 'Circa' in date_txt or "'s" in date_txt or "Posterior" in date_txt \
-                or date_txt == 'No presenta' or date_txt == 'No' or date_txt == 'S/F' or date_txt == 'Varias':
-            return date_txt
-        elif re.search(self.RE_FOUR_DIGIT_YEAR, date_txt):
+        if date_txt in cls.DATE_SKIP_EXACT or cls.RE_DATE_SKIP.search(date_txt):
             return date_txt
 
-        # RE attempts
-        # noinspection PyCompatibility
-        if match := re.search(self.RE_FOUR_DIGIT_YEAR_NAMED_MONTH, date_txt):
-            return format_stuff(date_txt, match.group('year'), match.group('potential_month'), named_month=True)
-        elif match := re.search(self.RE_FOUR_DIGIT_YEAR_NAMED_MONTH_DAY, date_txt):
-            return format_stuff(date_txt, match.group('year'), match.group('potential_month'),
-                                match.group('day'), named_month=True)
-        elif match := re.search(self.RE_NAMED_MONTH_FOUR_DIGIT_YEAR, date_txt):
-            return format_stuff(date_txt, match.group('year'), match.group('potential_month'), named_month=True)
-        elif match := re.search(self.RE_DAY_NAMED_MONTH_YEAR, date_txt):
-            return format_stuff(date_txt, match.group('year'), match.group('potential_month'),
-                                match.group('day'), named_month=True)
-        elif match := re.search(self.RE_MONTH_SLASH_YEAR, date_txt):
-            return format_stuff(date_txt, match.group('year'), match.group('month'))
-        elif match := re.search(self.RE_DD_MM_YYYY, date_txt):
-            return format_stuff(date_txt, match.group('year'), match.group('month'), match.group('day'))
+        # Single RE attempt; the non-None group prefix says which date shape matched
+        match = cls.RE_DATE.match(date_txt)
+        if match:
+            if match.group('bare_year'):
+                return date_txt
+            if match.group('ynm_year'):
+                return format_stuff(date_txt, match.group('ynm_year'), match.group('ynm_month'), named_month=True)
+            if match.group('ynmd_year'):
+                return format_stuff(date_txt, match.group('ynmd_year'), match.group('ynmd_month'),
+                                    match.group('ynmd_day'), named_month=True)
+            if match.group('nmy_year'):
+                return format_stuff(date_txt, match.group('nmy_year'), match.group('nmy_month'), named_month=True)
+            if match.group('dnmy_year'):
+                return format_stuff(date_txt, match.group('dnmy_year'), match.group('dnmy_month'),
+                                    match.group('dnmy_day'), named_month=True)
+            if match.group('my_year'):
+                return format_stuff(date_txt, match.group('my_year'), match.group('my_month'))
+            if match.group('dmy_year'):
+                return format_stuff(date_txt, match.group('dmy_year'), match.group('dmy_month'),
+                                    match.group('dmy_day'))
 
         return date_txt
 
     @staticmethod
     def _remove_end_dots(txt: str) -> str:
-        """ Remove the final dot of some fields in order to clean the field """
-        if isinstance(txt, str):
-            txt = txt.strip()
-            if txt.endswith('.'):
-                txt = txt[:-1]
-        return txt
+        """ Remove trailing dots of some fields in order to clean the field """
+        return txt.strip().rstrip('.') if isinstance(txt, str) else txt
 
 
 if __name__ == '__main__':